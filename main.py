@@ -6,16 +6,28 @@ Checks bus times and sends alerts via Telegram.
 
 import os
 import sys
+import time
 import yaml
-import json
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-import pytz
+from typing import FrozenSet, TYPE_CHECKING
+from zoneinfo import ZoneInfo
 
-from src.metro_api import MetroTransitAPI
+from src import json_utils
 from src.alert_logic import AlertCalculator
-from src.notifier import TelegramNotifier
-from src.state_manager import StateManager
+
+# The API client, notifier, and state manager pull in requests, httpx, and
+# sqlite3. They are imported in create_components, after the active-window
+# and pause checks, so runs that exit early skip those imports. asyncio is
+# likewise only imported where a check is actually run.
+if TYPE_CHECKING:
+    from src.metro_api import MetroTransitAPI
+    from src.notifier import TelegramNotifier
+    from src.state_manager import StateManager
+
+# Use the libyaml-backed loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 
 def is_paused() -> bool:
@@ -31,10 +43,9 @@ def is_paused() -> bool:
         return False
 
     try:
-        with open(pause_file, 'r') as f:
-            state = json.load(f)
-            return state.get('paused', False)
-    except (json.JSONDecodeError, IOError):
+        state = json_utils.loads(pause_file.read_bytes())
+        return state.get('paused', False)
+    except (json_utils.JSONDecodeError, IOError):
         return False
 
 
@@ -42,54 +53,122 @@ def load_config(config_path: str = "config.yaml") -> dict:
     """Load configuration from YAML file."""
     try:
         with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
+            return yaml.load(f, Loader=_YAML_LOADER)
     except Exception as e:
         print(f"Error loading config: {e}")
         sys.exit(1)
 
 
-def is_active_time(config: dict, current_time: datetime) -> bool:
+@dataclass(frozen=True, slots=True)
+class Prefs:
+    """Schedule preferences parsed once at config-load time."""
+
+    start_minutes: int
+    end_minutes: int
+    active_days: FrozenSet[int]
+    tz: ZoneInfo
+
+
+def _parse_minutes(hhmm: str) -> int:
+    """Convert an "HH:MM" string to minutes since midnight."""
+    hour, minute = map(int, hhmm.split(':'))
+    return hour * 60 + minute
+
+
+def _format_minutes(minutes: int) -> str:
+    """Convert minutes since midnight back to an "HH:MM" string."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def load_prefs(config: dict) -> Prefs:
     """
-    Check if current time is within the active monitoring window.
+    Parse the schedule preferences out of the configuration.
 
     Args:
         config: Configuration dictionary
-        current_time: Current time (UTC)
 
     Returns:
-        True if within active window, False otherwise
+        Prefs with the active window precomputed as minutes since midnight
     """
     prefs = config['user_preferences']
-    tz = pytz.timezone(prefs['timezone'])
 
-    # Convert current time to local timezone
-    local_time = current_time.astimezone(tz)
+    return Prefs(
+        start_minutes=_parse_minutes(prefs['active_timeframe']['start']),
+        end_minutes=_parse_minutes(prefs['active_timeframe']['end']),
+        active_days=frozenset(prefs['active_days']),
+        tz=ZoneInfo(prefs['timezone'])
+    )
+
+
+def is_active_time(prefs: Prefs, current_time: datetime) -> bool:
+    """
+    Check if current time is within the active monitoring window.
+
+    Args:
+        prefs: Parsed schedule preferences
+        current_time: Current time (converted to the local timezone if needed)
+
+    Returns:
+        True if within active window, False otherwise
+    """
+    if current_time.tzinfo is prefs.tz:
+        local_time = current_time
+    else:
+        local_time = current_time.astimezone(prefs.tz)
 
     # Check if today is an active day (0=Monday, 6=Sunday)
-    if local_time.weekday() not in prefs['active_days']:
+    if local_time.weekday() not in prefs.active_days:
         print(f"Today ({local_time.strftime('%A')}) is not an active day")
         return False
 
-    # Parse active timeframe
-    start_str = prefs['active_timeframe']['start']
-    end_str = prefs['active_timeframe']['end']
+    current_minutes = local_time.hour * 60 + local_time.minute
 
-    start_hour, start_min = map(int, start_str.split(':'))
-    end_hour, end_min = map(int, end_str.split(':'))
+    if not (prefs.start_minutes <= current_minutes <= prefs.end_minutes):
+        window = f"{_format_minutes(prefs.start_minutes)}-{_format_minutes(prefs.end_minutes)}"
+        print(f"Current time {local_time.strftime('%I:%M %p')} is outside active window ({window})")
+        return False
 
-    current_hour = local_time.hour
-    current_min = local_time.minute
+    return True
 
-    # Convert to minutes since midnight for easier comparison
-    current_minutes = current_hour * 60 + current_min
-    start_minutes = start_hour * 60 + start_min
-    end_minutes = end_hour * 60 + end_min
 
-    if not (start_minutes <= current_minutes <= end_minutes):
-        print(f"Current time {local_time.strftime('%I:%M %p')} is outside active window ({start_str}-{end_str})")
-        return False
+def create_alert_calculator(config: dict) -> AlertCalculator:
+    """Create the alert calculator from user preferences."""
+    return AlertCalculator(
+        walking_time_minutes=config['user_preferences']['walking_time_minutes'],
+        advance_notice_minutes=config['user_preferences']['advance_notice_minutes'],
+        timezone_str=config['user_preferences']['timezone']
+    )
 
-    return True
+
+def create_components(config: dict, service: bool = False):
+    """
+    Create the API client, notifier, and state manager.
+
+    Args:
+        config: Configuration dictionary
+        service: Whether the components are for the long-running --forever
+            service (the JSON state is then journaled between snapshots)
+
+    Returns:
+        Tuple of (MetroTransitAPI, TelegramNotifier, StateManager or SQLiteStateManager)
+    """
+    from src.metro_api import MetroTransitAPI
+    from src.notifier import TelegramNotifier
+    from src.state_manager import StateManager, SQLiteStateManager
+
+    api = MetroTransitAPI(
+        base_url=config['api']['base_url'],
+        timeout=config['api']['timeout_seconds']
+    )
+
+    notifier = TelegramNotifier()
+
+    if config.get('state', {}).get('backend', 'json') == 'sqlite':
+        state = SQLiteStateManager()
+    else:
+        state = StateManager(journal=service)
+
+    return api, notifier, state
 
 
 def main():
@@ -100,16 +179,18 @@ def main():
 
     # Load configuration
     config = load_config()
+    prefs = load_prefs(config)
+
+    alert_calc = create_alert_calculator(config)
 
-    # Get current time
+    # Get current time (converted to local time once for the whole run)
     current_time = datetime.now(timezone.utc)
-    tz = pytz.timezone(config['user_preferences']['timezone'])
-    local_time = current_time.astimezone(tz)
+    local_time = alert_calc.prime(current_time)
     print(f"Current time: {local_time.strftime('%A, %B %d, %Y %I:%M %p %Z')}")
     print()
 
     # Check if we should run
-    if not is_active_time(config, current_time):
+    if not is_active_time(prefs, local_time):
         print("Outside active monitoring window. Exiting.")
         return
 
@@ -121,33 +202,132 @@ def main():
 
     # Initialize components
     print("Initializing components...")
-    api = MetroTransitAPI(
-        base_url=config['api']['base_url'],
-        timeout=config['api']['timeout_seconds']
-    )
+    api, notifier, state = create_components(config)
+    print("Components initialized.\n")
 
-    alert_calc = AlertCalculator(
-        walking_time_minutes=config['user_preferences']['walking_time_minutes'],
-        advance_notice_minutes=config['user_preferences']['advance_notice_minutes'],
-        timezone_str=config['user_preferences']['timezone']
-    )
+    import asyncio
+    asyncio.run(check_once(config, api, alert_calc, notifier, state, current_time))
 
-    notifier = TelegramNotifier()
-    state = StateManager()
+    print("\n" + "=" * 60)
+    print("Run complete!")
+    print("=" * 60)
+
+
+async def run_forever(interval_seconds: int = 300):
+    """
+    Run as a long-lived service that checks departures on a fixed interval.
+
+    Config, the API client and its connections, the alert calculator, and
+    state are created once and reused on every tick instead of being rebuilt
+    per cron start.
 
+    Args:
+        interval_seconds: Seconds between checks (default 5 minutes)
+    """
+    print("=" * 60)
+    print("Metro Transit Pings - Bus Alert Service")
+    print("=" * 60)
+
+    config = load_config()
+    prefs = load_prefs(config)
+    alert_calc = create_alert_calculator(config)
+    api, notifier, state = create_components(config, service=True)
+
+    print(f"Checking every {interval_seconds} seconds. Press Ctrl+C to stop.\n")
+
+    try:
+        while True:
+            current_time = datetime.now(timezone.utc)
+            local_time = alert_calc.prime(current_time)
+            print(f"Current time: {local_time.strftime('%A, %B %d, %Y %I:%M %p %Z')}")
+
+            if not is_active_time(prefs, local_time):
+                print("Outside active monitoring window. Waiting for next check.")
+            elif is_paused():
+                print("⏸️  Alerts are currently paused. Send /start to resume.")
+            else:
+                try:
+                    await check_departures(config, api, alert_calc, notifier, state, current_time)
+                except Exception as e:
+                    print(f"Error during check: {e}")
+
+            print()
+
+            # Sleep until the next interval boundary so checks stay aligned
+            await asyncio.sleep(interval_seconds - time.time() % interval_seconds)
+    finally:
+        await api.aclose()
+        state.close()
+
+
+async def check_once(
+    config: dict,
+    api: "MetroTransitAPI",
+    alert_calc: AlertCalculator,
+    notifier: "TelegramNotifier",
+    state: "StateManager",
+    current_time: datetime
+):
+    """
+    Run a single check, then close the API client's connections and the state.
+
+    Args:
+        config: Configuration dictionary
+        api: Metro Transit API client
+        alert_calc: AlertCalculator primed with current_time
+        notifier: Telegram notifier
+        state: State manager
+        current_time: Current time (UTC)
+    """
+    try:
+        await check_departures(config, api, alert_calc, notifier, state, current_time)
+    finally:
+        await api.aclose()
+        state.close()
+
+
+async def check_departures(
+    config: dict,
+    api: "MetroTransitAPI",
+    alert_calc: AlertCalculator,
+    notifier: "TelegramNotifier",
+    state: "StateManager",
+    current_time: datetime
+):
+    """
+    Fetch departures for all configured routes and send any alerts that are due.
+
+    Args:
+        config: Configuration dictionary
+        api: Metro Transit API client
+        alert_calc: AlertCalculator primed with current_time
+        notifier: Telegram notifier
+        state: State manager
+        current_time: Current time (UTC)
+    """
     # Update last run time
     state.update_last_run(current_time)
 
     # Clean up old state entries
     state.cleanup_old_entries(max_age_hours=2)
 
-    print("Components initialized.\n")
+    # Departures are only cached for the duration of one check
+    api.clear_cache()
 
     # Get all routes to check
     routes = config['routes']
     all_alerts_to_send = []
     all_delay_updates = []
 
+    # (route_id, departure_time) pairs already queued for alerting; the API
+    # sometimes returns duplicate entries for the same departure
+    seen_alerts = set()
+
+    # Fetch departures for every configured stop concurrently
+    stop_ids = [str(route_config['stop_id']) for route_config in routes]
+    departures_by_stop = await api.get_departures_many(stop_ids)
+    grouped_by_stop = {}
+
     for route_config in routes:
         route_id = str(route_config['route_id'])
         stop_id = str(route_config['stop_id'])
@@ -156,14 +336,15 @@ def main():
         print(f"Checking {description}...")
 
         try:
-            # Fetch departures from API
-            all_departures = api.get_departures(stop_id)
+            # Departures were fetched up front; surface a failed fetch here
+            all_departures = departures_by_stop[stop_id]
+            if isinstance(all_departures, Exception):
+                raise all_departures
 
-            # Filter for this route
-            route_departures = api.filter_departures_by_route(
-                all_departures,
-                route_id
-            )
+            # Group each stop's departures by route once, then look up this route
+            if stop_id not in grouped_by_stop:
+                grouped_by_stop[stop_id] = api.group_by_route(all_departures)
+            route_departures = grouped_by_stop[stop_id].get(route_id, [])
 
             if not route_departures:
                 print(f"  No departures found for {description}")
@@ -171,18 +352,16 @@ def main():
 
             print(f"  Found {len(route_departures)} departure(s)")
 
-            # Check each departure
-            for departure in route_departures:
-                trip_id = str(departure.get('trip_id', ''))
-                departure_time = api.parse_departure_time(departure)
-
-                # Check if departure is relevant (not too far in future)
-                if not alert_calc.is_departure_relevant(departure_time, current_time):
-                    continue
+            # Work out relevance and alert timing for all departures at once;
+            # only relevant departures (not too far in future) come back
+            departure_timestamps = [api.parse_departure_timestamp(d) for d in route_departures]
+            evaluated = alert_calc.evaluate_departures(departure_timestamps)
 
-                # Calculate times
-                leave_time = alert_calc.calculate_leave_time(departure_time)
-                should_alert = alert_calc.should_alert_now(departure_time, current_time)
+            # Check each relevant departure
+            for index, leave_ts, should_alert in evaluated:
+                departure = route_departures[index]
+                departure_ts = departure_timestamps[index]
+                trip_id = str(departure.get('trip_id', ''))
 
                 # Check if we've already alerted for this departure
                 already_alerted = state.has_alerted(route_id, trip_id, stop_id)
@@ -191,12 +370,16 @@ def main():
                     # This is a new alert to send
                     print(f"    ✓ Alert needed: {api.format_departure(departure)}")
 
-                    # Add calculated times to departure
-                    departure['departure_datetime'] = departure_time
-                    departure['leave_datetime'] = leave_time
-                    all_alerts_to_send.append(departure)
+                    # Add calculated times to departure, skipping duplicates
+                    alert_key = (departure.get('route_id'), departure.get('departure_time'))
+                    if alert_key not in seen_alerts:
+                        seen_alerts.add(alert_key)
+                        departure['departure_ts'] = departure_ts
+                        departure['leave_ts'] = leave_ts
+                        all_alerts_to_send.append(departure)
 
                     # Record the alert (we'll actually send it later)
+                    departure_time = datetime.fromtimestamp(departure_ts, timezone.utc)
                     state.record_alert(route_id, trip_id, stop_id, departure_time, current_time)
 
                 elif already_alerted:
@@ -204,8 +387,8 @@ def main():
                     tracked = state.get_tracked_departure(route_id, trip_id, stop_id)
 
                     if tracked:
-                        original_time = datetime.fromisoformat(tracked['original_departure_time'])
-                        delay_minutes = alert_calc.calculate_delay(original_time, departure_time)
+                        original_ts = tracked['original_departure_ts']
+                        delay_minutes = alert_calc.calculate_delay(original_ts, departure_ts)
 
                         # If delayed by more than threshold and we haven't sent update yet
                         delay_threshold = config['alerts']['delay_threshold_minutes']
@@ -215,13 +398,14 @@ def main():
                             all_delay_updates.append({
                                 'route': departure.get('route_short_name', route_id),
                                 'description': departure.get('description', 'Unknown'),
-                                'original_time': original_time,
-                                'new_time': departure_time,
+                                'original_time': original_ts,
+                                'new_time': departure_ts,
                                 'delay_minutes': delay_minutes
                             })
 
                             # Record the delay update
-                            state.record_delay_update(route_id, trip_id, stop_id, departure_time)
+                            new_departure_time = datetime.fromtimestamp(departure_ts, timezone.utc)
+                            state.record_delay_update(route_id, trip_id, stop_id, new_departure_time)
 
         except Exception as e:
             print(f"  Error checking {description}: {e}")
@@ -229,17 +413,8 @@ def main():
 
     print()
 
-    # Deduplicate alerts by departure time and route
-    # (API sometimes returns duplicate entries for same departure)
-    if all_alerts_to_send:
-        seen = {}
-        deduped_alerts = []
-        for alert in all_alerts_to_send:
-            key = (alert.get('route_id'), alert.get('departure_time'))
-            if key not in seen:
-                seen[key] = True
-                deduped_alerts.append(alert)
-        all_alerts_to_send = deduped_alerts
+    # Make everything recorded during this check durable in one step
+    state.flush()
 
     # Send alerts
     if all_alerts_to_send:
@@ -264,26 +439,24 @@ def main():
     if all_delay_updates:
         print(f"\nSending {len(all_delay_updates)} delay update(s)...")
 
-        for delay in all_delay_updates:
-            success = notifier.send_delay_alert(
-                route=delay['route'],
-                description=delay['description'],
-                original_time=delay['original_time'],
-                new_time=delay['new_time'],
-                delay_minutes=delay['delay_minutes'],
-                alert_calculator=alert_calc,
-                current_time=current_time
-            )
-
-            if success:
-                print(f"  ✓ Delay update sent for {delay['route']}")
-            else:
-                print(f"  ✗ Failed to send delay update for {delay['route']}")
+        success = notifier.send_delay_alerts(all_delay_updates, alert_calc, current_time)
+        delayed_routes = ", ".join(str(delay['route']) for delay in all_delay_updates)
 
-    print("\n" + "=" * 60)
-    print("Run complete!")
-    print("=" * 60)
+        if success:
+            print(f"  ✓ Delay update sent for {delayed_routes}")
+        else:
+            print(f"  ✗ Failed to send delay update for {delayed_routes}")
 
 
 if __name__ == "__main__":
-    main()
+    if "--forever" in sys.argv[1:]:
+        # Module-level import (asyncio is deferred for the one-shot path), so
+        # run_forever can use it
+        import asyncio
+
+        try:
+            asyncio.run(run_forever())
+        except KeyboardInterrupt:
+            print("Stopped.")
+    else:
+        main()
@@ -1,11 +1,16 @@
 """
 Alert Logic Engine
 Calculates when to send alerts based on bus departure times and user preferences.
+
+All times are Unix timestamps (seconds). Differences between them do not
+depend on the timezone, so conversion to local time only happens when a
+time is formatted for display.
 """
 
-from datetime import datetime, timezone, timedelta
+import time
+from datetime import datetime
 from typing import List, Dict, Optional, Tuple
-import pytz
+from zoneinfo import ZoneInfo
 
 
 class AlertCalculator:
@@ -27,135 +32,192 @@ class AlertCalculator:
         """
         self.walking_time_minutes = walking_time_minutes
         self.advance_notice_minutes = advance_notice_minutes
-        self.timezone = pytz.timezone(timezone_str)
+        self.timezone = ZoneInfo(timezone_str)
+        self._now_ts: Optional[float] = None
+        self._now_local: Optional[datetime] = None
+
+    def prime(self, current_time: datetime) -> datetime:
+        """
+        Cache the current time for this run so it is only converted once.
+
+        Methods called without an explicit current_ts use the primed value.
 
-    def calculate_leave_time(self, departure_time: datetime) -> datetime:
+        Args:
+            current_time: Current time (UTC)
+
+        Returns:
+            Current time in the local timezone
+        """
+        self._now_ts = current_time.timestamp()
+        self._now_local = current_time.astimezone(self.timezone)
+        return self._now_local
+
+    def _resolve_now(self, current_ts: Optional[float]) -> float:
+        """Return current_ts, falling back to the primed time or time.time()."""
+        if current_ts is not None:
+            return current_ts
+        if self._now_ts is not None:
+            return self._now_ts
+        return time.time()
+
+    def calculate_leave_time(self, departure_ts: float) -> float:
         """
         Calculate when the user needs to leave home.
 
         Args:
-            departure_time: When the bus departs (UTC)
+            departure_ts: When the bus departs (Unix timestamp)
 
         Returns:
-            When the user should leave home (UTC)
+            When the user should leave home (Unix timestamp)
         """
         # Leave time = departure time - walking time
-        leave_time = departure_time - timedelta(minutes=self.walking_time_minutes)
-        return leave_time
+        return departure_ts - self.walking_time_minutes * 60
 
-    def calculate_alert_time(self, departure_time: datetime) -> datetime:
+    def calculate_alert_time(self, departure_ts: float) -> float:
         """
         Calculate when to send the alert.
 
         Args:
-            departure_time: When the bus departs (UTC)
+            departure_ts: When the bus departs (Unix timestamp)
 
         Returns:
-            When to send the alert (UTC)
+            When to send the alert (Unix timestamp)
         """
-        leave_time = self.calculate_leave_time(departure_time)
         # Alert time = leave time - advance notice
-        alert_time = leave_time - timedelta(minutes=self.advance_notice_minutes)
-        return alert_time
+        return self.calculate_leave_time(departure_ts) - self.advance_notice_minutes * 60
 
     def should_alert_now(
         self,
-        departure_time: datetime,
-        current_time: Optional[datetime] = None
+        departure_ts: float,
+        current_ts: Optional[float] = None
     ) -> bool:
         """
         Determine if an alert should be sent now.
 
         Args:
-            departure_time: When the bus departs (UTC)
-            current_time: Current time (UTC). If None, uses datetime.now(UTC)
+            departure_ts: When the bus departs (Unix timestamp)
+            current_ts: Current time (Unix timestamp). If None, uses the primed time or time.time()
 
         Returns:
             True if alert should be sent now, False otherwise
         """
-        if current_time is None:
-            current_time = datetime.now(timezone.utc)
+        current_ts = self._resolve_now(current_ts)
 
-        alert_time = self.calculate_alert_time(departure_time)
-        leave_time = self.calculate_leave_time(departure_time)
+        alert_ts = self.calculate_alert_time(departure_ts)
+        leave_ts = self.calculate_leave_time(departure_ts)
 
         # Alert should be sent if:
         # 1. Current time is past the alert time
         # 2. Current time is before the leave time (not too late)
-        return alert_time <= current_time <= leave_time
+        return alert_ts <= current_ts <= leave_ts
 
     def is_departure_relevant(
         self,
-        departure_time: datetime,
-        current_time: Optional[datetime] = None,
+        departure_ts: float,
+        current_ts: Optional[float] = None,
         max_wait_minutes: int = 60
     ) -> bool:
         """
         Check if a departure is relevant (not too soon, not too far away).
 
+        check_departures uses evaluate_departures, which applies the same test
+        to a whole list; this is kept for checking a single departure.
+
         Args:
-            departure_time: When the bus departs (UTC)
-            current_time: Current time (UTC). If None, uses datetime.now(UTC)
+            departure_ts: When the bus departs (Unix timestamp)
+            current_ts: Current time (Unix timestamp). If None, uses the primed time or time.time()
             max_wait_minutes: Maximum wait time to consider (default 60 min)
 
         Returns:
             True if departure is relevant, False otherwise
         """
-        if current_time is None:
-            current_time = datetime.now(timezone.utc)
+        current_ts = self._resolve_now(current_ts)
 
-        alert_time = self.calculate_alert_time(departure_time)
-        time_until_alert = (alert_time - current_time).total_seconds() / 60
+        alert_ts = self.calculate_alert_time(departure_ts)
+        time_until_alert = (alert_ts - current_ts) / 60
 
         # Departure is relevant if:
         # 1. Alert time is in the future (or very recent past - within alert window)
         # 2. Not too far in the future (within max_wait_minutes)
         return -self.advance_notice_minutes <= time_until_alert <= max_wait_minutes
 
-    def format_time_local(self, dt: datetime) -> str:
+    def evaluate_departures(
+        self,
+        departure_timestamps: List[float],
+        current_ts: Optional[float] = None,
+        max_wait_minutes: int = 60
+    ) -> List[Tuple[int, float, bool]]:
+        """
+        Evaluate relevance and alert timing for many departures in one pass.
+
+        Equivalent to calling is_departure_relevant, calculate_leave_time and
+        should_alert_now for each departure, with the offsets computed once.
+
+        Args:
+            departure_timestamps: Departure times (Unix timestamps)
+            current_ts: Current time (Unix timestamp). If None, uses the primed time or time.time()
+            max_wait_minutes: Maximum wait time to consider (default 60 min)
+
+        Returns:
+            List of (index, leave_ts, should_alert) tuples for the relevant departures
+        """
+        current_ts = self._resolve_now(current_ts)
+
+        walk_seconds = self.walking_time_minutes * 60
+        lead_seconds = (self.walking_time_minutes + self.advance_notice_minutes) * 60
+        earliest = -self.advance_notice_minutes * 60
+        latest = max_wait_minutes * 60
+
+        results = []
+        for index, departure_ts in enumerate(departure_timestamps):
+            alert_ts = departure_ts - lead_seconds
+            if earliest <= alert_ts - current_ts <= latest:
+                leave_ts = departure_ts - walk_seconds
+                results.append((index, leave_ts, alert_ts <= current_ts <= leave_ts))
+
+        return results
+
+    def format_time_local(self, ts: float) -> str:
         """
-        Format a datetime in local timezone.
+        Format a timestamp in local timezone.
 
         Args:
-            dt: datetime object (any timezone)
+            ts: Unix timestamp
 
         Returns:
             Formatted string in local timezone (e.g., "8:45 AM")
         """
-        local_time = dt.astimezone(self.timezone)
+        local_time = datetime.fromtimestamp(ts, self.timezone)
         return local_time.strftime("%I:%M %p").lstrip("0")
 
-    def minutes_until(self, future_time: datetime, current_time: Optional[datetime] = None) -> int:
+    def minutes_until(self, future_ts: float, current_ts: Optional[float] = None) -> int:
         """
         Calculate minutes until a future time.
 
         Args:
-            future_time: Future datetime
-            current_time: Current time. If None, uses datetime.now(UTC)
+            future_ts: Future time (Unix timestamp)
+            current_ts: Current time (Unix timestamp). If None, uses the primed time or time.time()
 
         Returns:
             Number of minutes (rounded)
         """
-        if current_time is None:
-            current_time = datetime.now(timezone.utc)
+        current_ts = self._resolve_now(current_ts)
 
-        delta = future_time - current_time
-        return round(delta.total_seconds() / 60)
+        return round((future_ts - current_ts) / 60)
 
     def calculate_delay(
         self,
-        original_departure_time: datetime,
-        current_departure_time: datetime
+        original_departure_ts: float,
+        current_departure_ts: float
     ) -> int:
         """
         Calculate delay in minutes between original and current departure times.
 
         Args:
-            original_departure_time: Original predicted departure time
-            current_departure_time: Current predicted departure time
+            original_departure_ts: Original predicted departure time (Unix timestamp)
+            current_departure_ts: Current predicted departure time (Unix timestamp)
 
         Returns:
             Delay in minutes (positive = late, negative = early)
         """
-        delta = current_departure_time - original_departure_time
-        return round(delta.total_seconds() / 60)
+        return round((current_departure_ts - original_departure_ts) / 60)
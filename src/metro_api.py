@@ -3,8 +3,9 @@ Metro Transit API Client
 Handles all interactions with the Metro Transit NexTrip API.
 """
 
-import requests
-from typing import List, Dict, Optional
+import asyncio
+import httpx
+from typing import List, Dict, Optional, Union
 from datetime import datetime, timezone
 
 
@@ -22,6 +23,28 @@ class MetroTransitAPI:
         self.base_url = base_url
         self.timeout = timeout
 
+        # Pooled requests session for get_departures, created on first use;
+        # main.py only goes through get_departures_many
+        self.session = None
+
+        # Async client for get_departures_many (the path main.py uses), created
+        # on first use and kept open so its pooled keep-alive connections are
+        # reused across checks; see aclose()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Departures already fetched during this run, keyed by stop ID
+        self._cache: Dict[str, List[Dict]] = {}
+
+    async def aclose(self):
+        """Close the async HTTP client and its pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def clear_cache(self):
+        """Forget departures fetched so far so the next call hits the API again."""
+        self._cache.clear()
+
     def get_departures(self, stop_id: str) -> List[Dict]:
         """
         Get all upcoming departures for a specific stop.
@@ -33,17 +56,32 @@ class MetroTransitAPI:
             List of departure dictionaries
 
         Raises:
-            requests.exceptions.RequestException: If the API request fails
+            Exception: If the API request fails
         """
+        import requests
+
+        if stop_id in self._cache:
+            return self._cache[stop_id]
+
+        if self.session is None:
+            from requests.adapters import HTTPAdapter
+
+            # Reuse connections (and TLS sessions) across calls
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
         url = f"{self.base_url}/{stop_id}"
 
         try:
-            response = requests.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
 
             data = response.json()
             departures = data.get('departures', [])
 
+            self._cache[stop_id] = departures
             return departures
 
         except requests.exceptions.Timeout:
@@ -51,6 +89,71 @@ class MetroTransitAPI:
         except requests.exceptions.RequestException as e:
             raise Exception(f"Metro Transit API request failed for stop {stop_id}: {e}")
 
+    async def get_departures_many(self, stop_ids: List[str]) -> Dict[str, Union[List[Dict], Exception]]:
+        """
+        Get upcoming departures for several stops concurrently.
+
+        Each distinct stop is fetched at most once; stops already fetched
+        during this run are served from the cache.
+
+        Args:
+            stop_ids: The stop IDs to query
+
+        Returns:
+            Dictionary mapping each stop ID to its list of departures, or to the
+            exception raised while fetching that stop
+        """
+        results: Dict[str, Union[List[Dict], Exception]] = {
+            stop_id: self._cache[stop_id]
+            for stop_id in stop_ids
+            if stop_id in self._cache
+        }
+        to_fetch = [stop_id for stop_id in dict.fromkeys(stop_ids) if stop_id not in results]
+
+        if to_fetch:
+            if self._client is None:
+                self._client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=8, max_keepalive_connections=8)
+                )
+
+            fetched = await asyncio.gather(
+                *(self._get_departures_async(self._client, stop_id) for stop_id in to_fetch),
+                return_exceptions=True
+            )
+
+            for stop_id, departures in zip(to_fetch, fetched):
+                if not isinstance(departures, Exception):
+                    self._cache[stop_id] = departures
+                results[stop_id] = departures
+
+        return results
+
+    async def _get_departures_async(self, client: httpx.AsyncClient, stop_id: str) -> List[Dict]:
+        """
+        Get all upcoming departures for a specific stop using an async client.
+
+        Args:
+            client: Shared httpx.AsyncClient
+            stop_id: The stop ID to query
+
+        Returns:
+            List of departure dictionaries
+        """
+        url = f"{self.base_url}/{stop_id}"
+
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+
+            data = response.json()
+            return data.get('departures', [])
+
+        except httpx.TimeoutException:
+            raise Exception(f"Metro Transit API request timed out for stop {stop_id}")
+        except httpx.HTTPError as e:
+            raise Exception(f"Metro Transit API request failed for stop {stop_id}: {e}")
+
     def filter_departures_by_route(
         self,
         departures: List[Dict],
@@ -81,26 +184,56 @@ class MetroTransitAPI:
 
         return filtered
 
+    def group_by_route(self, departures: List[Dict]) -> Dict[str, List[Dict]]:
+        """
+        Group departures by route ID in a single pass.
+
+        Args:
+            departures: List of all departures
+
+        Returns:
+            Dictionary mapping route ID to the departures for that route
+        """
+        grouped: Dict[str, List[Dict]] = {}
+
+        for d in departures:
+            grouped.setdefault(str(d.get('route_id', '')), []).append(d)
+
+        return grouped
+
     @staticmethod
-    def parse_departure_time(departure: Dict) -> datetime:
+    def parse_departure_timestamp(departure: Dict) -> float:
         """
-        Parse the departure time from a departure dictionary.
+        Parse the departure time from a departure dictionary as a Unix timestamp.
 
         Args:
             departure: Departure dictionary from API
 
         Returns:
-            datetime object in UTC timezone
+            Unix timestamp (seconds)
         """
         # The API returns Unix timestamp in the 'departure_time' field
         timestamp = departure.get('departure_time')
 
         if timestamp:
-            # Convert Unix timestamp to datetime (UTC)
-            return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+            return float(timestamp)
         else:
             raise ValueError("No departure_time found in departure data")
 
+    @staticmethod
+    def parse_departure_time(departure: Dict) -> datetime:
+        """
+        Parse the departure time from a departure dictionary.
+
+        Args:
+            departure: Departure dictionary from API
+
+        Returns:
+            datetime object in UTC timezone
+        """
+        timestamp = MetroTransitAPI.parse_departure_timestamp(departure)
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
     @staticmethod
     def is_real_time(departure: Dict) -> bool:
         """
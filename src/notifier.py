@@ -3,11 +3,19 @@ Telegram Notifier
 Sends alerts via Telegram bot.
 """
 
+import itertools
 import os
 import requests
-from typing import Optional, List, Dict
+from requests.adapters import HTTPAdapter
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 
+# Read once at import; TelegramNotifier falls back to these when no explicit
+# token or chat ID is passed, and re-reads the environment if they were unset
+# at import time (e.g. the variables are set after importing this module)
+_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+
 
 class TelegramNotifier:
     """Sends notifications via Telegram."""
@@ -17,11 +25,13 @@ class TelegramNotifier:
         Initialize the Telegram notifier.
 
         Args:
-            bot_token: Telegram bot token (if None, reads from TELEGRAM_BOT_TOKEN env var)
-            chat_id: Telegram chat ID (if None, reads from TELEGRAM_CHAT_ID env var)
+            bot_token: Telegram bot token (if None, uses TELEGRAM_BOT_TOKEN as read at
+                import time, or the current environment if it was unset then)
+            chat_id: Telegram chat ID (if None, uses TELEGRAM_CHAT_ID as read at
+                import time, or the current environment if it was unset then)
         """
-        self.bot_token = bot_token or os.getenv('TELEGRAM_BOT_TOKEN')
-        self.chat_id = chat_id or os.getenv('TELEGRAM_CHAT_ID')
+        self.bot_token = bot_token or _BOT_TOKEN or os.getenv('TELEGRAM_BOT_TOKEN')
+        self.chat_id = chat_id or _CHAT_ID or os.getenv('TELEGRAM_CHAT_ID')
 
         if not self.bot_token:
             raise ValueError("Telegram bot token not provided")
@@ -30,6 +40,10 @@ class TelegramNotifier:
 
         self.api_url = f"https://api.telegram.org/bot{self.bot_token}"
 
+        # Reuse the connection to the Telegram API across messages
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+
     def send_message(self, text: str, parse_mode: str = "Markdown") -> bool:
         """
         Send a message via Telegram.
@@ -50,7 +64,7 @@ class TelegramNotifier:
         }
 
         try:
-            response = requests.post(url, json=payload, timeout=10)
+            response = self.session.post(url, json=payload, timeout=10)
             response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
@@ -67,7 +81,8 @@ class TelegramNotifier:
         Send a bus alert for multiple departures.
 
         Args:
-            departures: List of departure dictionaries with calculated times
+            departures: List of departure dictionaries with calculated
+                'departure_ts' and 'leave_ts' Unix timestamps
             alert_calculator: AlertCalculator instance for time formatting
             current_time: Current time (UTC)
 
@@ -77,37 +92,48 @@ class TelegramNotifier:
         if not departures:
             return False
 
-        message_lines = ["🚌 *Time to head out!*\n"]
+        current_ts = current_time.timestamp()
 
-        for dep in departures:
-            route = dep.get('route_short_name', 'Unknown')
-            description = dep.get('description', 'Unknown')
-            departure_time = dep.get('departure_datetime')
-            leave_time = dep.get('leave_datetime')
+        message = "\n".join(itertools.chain(
+            ("🚌 *Time to head out!*\n",),
+            itertools.chain.from_iterable(
+                self._departure_lines(dep, alert_calculator, current_ts)
+                for dep in departures
+            )
+        ))
+        return self.send_message(message)
 
-            if not departure_time or not leave_time:
-                continue
+    @staticmethod
+    def _departure_lines(dep: Dict, alert_calculator, current_ts: float) -> Tuple[str, ...]:
+        """Format the message lines for a single departure (empty if it has no times)."""
+        departure_ts = dep.get('departure_ts')
+        leave_ts = dep.get('leave_ts')
 
-            depart_local = alert_calculator.format_time_local(departure_time)
-            leave_local = alert_calculator.format_time_local(leave_time)
+        if not departure_ts or not leave_ts:
+            return ()
 
-            minutes_until_depart = alert_calculator.minutes_until(departure_time, current_time)
-            minutes_until_leave = alert_calculator.minutes_until(leave_time, current_time)
+        route = dep.get('route_short_name', 'Unknown')
+        description = dep.get('description', 'Unknown')
 
-            message_lines.append(f"*{route}* to {description}")
-            message_lines.append(f"🚏 Departs: {depart_local} (in {minutes_until_depart} min)")
-            message_lines.append(f"🚶 Leave by: {leave_local} (in {minutes_until_leave} min)")
-            message_lines.append("")
+        depart_local = alert_calculator.format_time_local(departure_ts)
+        leave_local = alert_calculator.format_time_local(leave_ts)
 
-        message = "\n".join(message_lines)
-        return self.send_message(message)
+        minutes_until_depart = alert_calculator.minutes_until(departure_ts, current_ts)
+        minutes_until_leave = alert_calculator.minutes_until(leave_ts, current_ts)
+
+        return (
+            f"*{route}* to {description}",
+            f"🚏 Departs: {depart_local} (in {minutes_until_depart} min)",
+            f"🚶 Leave by: {leave_local} (in {minutes_until_leave} min)",
+            ""
+        )
 
     def send_delay_alert(
         self,
         route: str,
         description: str,
-        original_time: datetime,
-        new_time: datetime,
+        original_time: float,
+        new_time: float,
         delay_minutes: int,
         alert_calculator,
         current_time: datetime
@@ -118,31 +144,87 @@ class TelegramNotifier:
         Args:
             route: Route short name
             description: Route description
-            original_time: Original departure time
-            new_time: New departure time
+            original_time: Original departure time (Unix timestamp)
+            new_time: New departure time (Unix timestamp)
             delay_minutes: Minutes of delay
             alert_calculator: AlertCalculator instance for time formatting
-            current_time: Current time
+            current_time: Current time (UTC)
 
         Returns:
             True if successful, False otherwise
         """
+        message = self._format_delay(
+            route,
+            original_time,
+            new_time,
+            delay_minutes,
+            alert_calculator,
+            current_time.timestamp()
+        )
+
+        return self.send_message(message)
+
+    def send_delay_alerts(
+        self,
+        delays: List[Dict],
+        alert_calculator,
+        current_time: datetime
+    ) -> bool:
+        """
+        Send several delay notifications as a single message.
+
+        Args:
+            delays: List of dicts with 'route', 'original_time', 'new_time'
+                and 'delay_minutes' keys (times as Unix timestamps)
+            alert_calculator: AlertCalculator instance for time formatting
+            current_time: Current time (UTC)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not delays:
+            return False
+
+        current_ts = current_time.timestamp()
+
+        message = "\n\n".join(
+            self._format_delay(
+                delay['route'],
+                delay['original_time'],
+                delay['new_time'],
+                delay['delay_minutes'],
+                alert_calculator,
+                current_ts
+            )
+            for delay in delays
+        )
+
+        return self.send_message(message)
+
+    @staticmethod
+    def _format_delay(
+        route: str,
+        original_time: float,
+        new_time: float,
+        delay_minutes: int,
+        alert_calculator,
+        current_ts: float
+    ) -> str:
+        """Format the message block for a single delayed departure."""
         original_local = alert_calculator.format_time_local(original_time)
         new_local = alert_calculator.format_time_local(new_time)
 
         new_leave_time = alert_calculator.calculate_leave_time(new_time)
         new_leave_local = alert_calculator.format_time_local(new_leave_time)
-        minutes_until_leave = alert_calculator.minutes_until(new_leave_time, current_time)
+        minutes_until_leave = alert_calculator.minutes_until(new_leave_time, current_ts)
 
-        message = f"""⚠️ *Bus Update - {route} Delayed*
+        return f"""⚠️ *Bus Update - {route} Delayed*
 
 Original: {original_local}
 Now: {new_local} (+{delay_minutes} min delay)
 
 🚶 New leave time: {new_leave_local} (in {minutes_until_leave} min)"""
 
-        return self.send_message(message)
-
     def send_test_message(self) -> bool:
         """
         Send a test message to verify the bot is working.
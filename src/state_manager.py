@@ -3,71 +3,290 @@ State Manager
 Tracks sent alerts and departure states to prevent duplicates and detect delays.
 """
 
-import json
+import bisect
 import os
+import sqlite3
+import tempfile
+import time
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+from src import json_utils
+
+# (route_id, trip_id, stop_id)
+DepartureKey = Tuple[str, str, str]
+
+# State and journal files are read whole in one call; a large buffer keeps that
+# to a few syscalls
+_READ_BUFFER_SIZE = 1 << 16
 
 
 class StateManager:
     """Manages state for tracking sent alerts and detecting delays."""
 
-    def __init__(self, state_file: str = "alert_state.json"):
+    def __init__(
+        self,
+        state_file: str = "alert_state.json",
+        journal: bool = False,
+        snapshot_every: int = 100,
+        snapshot_interval: float = 3600,
+        max_entries: int = 10_000
+    ):
         """
         Initialize the state manager.
 
         Args:
             state_file: Path to the JSON file for storing state
+            journal: Journal changes between snapshots instead of rewriting the
+                state file on every flush() (for long-running processes)
+            snapshot_every: Rewrite the state file after this many journaled changes
+            snapshot_interval: Rewrite the state file at least this often (seconds)
+            max_entries: Maximum number of tracked departures; the oldest are evicted beyond this
         """
         self.state_file = state_file
+        self.max_entries = max_entries
+
+        # With journaling, changes are appended to the journal as they happen
+        # and made durable by flush(). The full state file is only rewritten
+        # periodically, after cleanup or eviction, and on close(); the journal
+        # is then emptied. A journal left by an earlier process is always
+        # replayed on load.
+        self.journal = journal
+        self.journal_file = state_file + ".journal"
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self._journal = None
+        self._journal_entries = 0
+        self._last_snapshot = time.monotonic()
+
         self.state = self._load_state()
 
+        # (original_departure_ts, key) pairs kept sorted so cleanup can binary
+        # search the cutoff. Entries re-recorded with a new time leave a stale
+        # pair behind, which cleanup recognises and skips.
+        self._by_time: List[Tuple[float, DepartureKey]] = sorted(
+            (dep["original_departure_ts"], key)
+            for key, dep in self.state["tracked_departures"].items()
+        )
+
+        # True while the state file is behind the in-memory state. Changes
+        # replayed from the journal still need to reach the state file.
+        self._dirty = self._journal_entries > 0
+
     def _load_state(self) -> Dict:
         """
-        Load state from file.
+        Load state from file, then replay any journaled changes on top of it.
 
         Returns:
             State dictionary
         """
+        state = self._new_state()
+
         if os.path.exists(self.state_file):
             try:
-                with open(self.state_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
+                with open(self.state_file, 'rb', buffering=_READ_BUFFER_SIZE) as f:
+                    loaded = json_utils.loads(f.read())
+            except (json_utils.JSONDecodeError, IOError):
                 print(f"Warning: Could not load state from {self.state_file}, starting fresh")
-                return self._new_state()
-        else:
-            return self._new_state()
+            else:
+                # Tracked departures are stored as a list on disk but indexed in memory
+                # by (route_id, trip_id, stop_id)
+                loaded["tracked_departures"] = {
+                    (dep["route_id"], dep["trip_id"], dep["stop_id"]): dep
+                    for dep in loaded.get("tracked_departures", [])
+                }
+                state = loaded
+
+        journaled = self._read_journal()
+        for record in journaled:
+            if record["op"] == "last_run":
+                state["last_run"] = record["value"]
+            else:
+                dep = record["entry"]
+                state["tracked_departures"][(dep["route_id"], dep["trip_id"], dep["stop_id"])] = dep
+        self._journal_entries = len(journaled)
+
+        # Entries written before epoch timestamps were stored only have the ISO string
+        for dep in state["tracked_departures"].values():
+            if "original_departure_ts" not in dep:
+                dep["original_departure_ts"] = datetime.fromisoformat(
+                    dep.get("original_departure_time", "1970-01-01T00:00:00+00:00")
+                ).timestamp()
+
+        return state
 
     def _new_state(self) -> Dict:
         """Create a new empty state."""
         return {
             "last_run": None,
-            "tracked_departures": []
+            "tracked_departures": {}
         }
 
-    def _save_state(self):
-        """Save state to file."""
+    def _read_journal(self) -> List[Dict]:
+        """
+        Read the records appended to the journal since the last snapshot.
+
+        Returns:
+            Journal records ({"op": "put", "entry": ...} or
+            {"op": "last_run", "value": ...}), oldest first
+        """
+        if not os.path.exists(self.journal_file):
+            return []
+
+        records = []
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(self.state, f, indent=2)
+            with open(self.journal_file, 'rb', buffering=_READ_BUFFER_SIZE) as f:
+                lines = f.read().splitlines()
+        except IOError as e:
+            print(f"Warning: Could not read {self.journal_file}: {e}")
+            return []
+
+        for line in lines:
+            try:
+                record = json_utils.loads(line)
+            except json_utils.JSONDecodeError:
+                # A crash mid-append can leave a partial last line
+                continue
+            if record.get("op") in ("put", "last_run"):
+                records.append(record)
+
+        return records
+
+    def _append_journal(self, record: Dict):
+        """
+        Append a change to the journal, if journaling; flush() makes it durable.
+
+        Args:
+            record: Journal record describing the change
+        """
+        if not self.journal:
+            return
+
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'ab')
+            self._journal.write(json_utils.dumps(record) + b"\n")
+        except IOError as e:
+            print(f"Warning: Could not write to {self.journal_file}: {e}")
+
+        self._journal_entries += 1
+
+    def _reset_journal(self):
+        """Empty the journal once its entries are part of a saved snapshot."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self._journal_entries = 0
+
+    def _save_state(self) -> bool:
+        """
+        Save state to file.
+
+        Writes to a temporary file in the same directory and renames it over
+        the state file, so a crash mid-write never leaves a truncated file.
+
+        Returns:
+            True if the state was saved, False otherwise
+        """
+        on_disk = dict(self.state, tracked_departures=list(self.state["tracked_departures"].values()))
+        tmp_path = None
+
+        try:
+            with tempfile.NamedTemporaryFile(
+                mode='wb',
+                dir=os.path.dirname(self.state_file) or '.',
+                prefix=os.path.basename(self.state_file) + '.',
+                suffix='.tmp',
+                delete=False
+            ) as f:
+                tmp_path = f.name
+                f.write(json_utils.dumps(on_disk))
+                f.flush()
+                os.fsync(f.fileno())
+
+            # NamedTemporaryFile is created 0600; keep the mode a plain open() would give
+            os.chmod(tmp_path, self._file_mode())
+
+            os.replace(tmp_path, self.state_file)
+            return True
         except IOError as e:
             print(f"Warning: Could not save state to {self.state_file}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+
+    def _file_mode(self) -> int:
+        """Permission bits for the state file: the existing file's, or 0666 minus the umask."""
+        try:
+            return os.stat(self.state_file).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def flush(self):
+        """
+        Make the changes recorded so far durable.
+
+        Called once per cycle. Without journaling this rewrites the state file
+        if it changed. With journaling it syncs the journal, and only rewrites
+        the state file once snapshot_every changes have been journaled or
+        snapshot_interval seconds have passed since the last snapshot.
+        """
+        if not self.journal:
+            self._snapshot()
+            return
 
-    def update_last_run(self, run_time: Optional[datetime] = None):
+        if self._journal is not None:
+            try:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            except IOError as e:
+                print(f"Warning: Could not sync {self.journal_file}: {e}")
+
+        if (self._journal_entries >= self.snapshot_every
+                or time.monotonic() - self._last_snapshot >= self.snapshot_interval):
+            self._snapshot()
+
+    def _snapshot(self):
+        """Rewrite the state file if it is behind, then empty the journal."""
+        if self._dirty and self._save_state():
+            self._dirty = False
+            self._reset_journal()
+        self._last_snapshot = time.monotonic()
+
+    def close(self):
+        """Write a final snapshot, keeping the journal if that fails."""
+        self._snapshot()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def update_last_run(self, run_time: Optional[datetime] = None, persist: bool = False):
         """
         Update the last run timestamp.
 
+        The change is journaled and made durable by the next flush() unless
+        persist is set.
+
         Args:
             run_time: Time of the run (UTC). If None, uses current time.
+            persist: Rewrite the state file immediately as a checkpoint
         """
         if run_time is None:
             run_time = datetime.now(timezone.utc)
 
         self.state["last_run"] = run_time.isoformat()
-        self._save_state()
+        self._dirty = True
+        self._append_journal({"op": "last_run", "value": self.state["last_run"]})
+
+        if persist:
+            self._snapshot()
 
-    def _create_departure_key(self, route_id: str, trip_id: str, stop_id: str) -> str:
+    def _create_departure_key(self, route_id: str, trip_id: str, stop_id: str) -> DepartureKey:
         """
         Create a unique key for a departure.
 
@@ -77,9 +296,9 @@ class StateManager:
             stop_id: Stop ID
 
         Returns:
-            Unique departure key
+            Unique departure key used to index tracked departures
         """
-        return f"{route_id}_{trip_id}_{stop_id}"
+        return (str(route_id), str(trip_id), str(stop_id))
 
     def has_alerted(self, route_id: str, trip_id: str, stop_id: str) -> bool:
         """
@@ -94,12 +313,9 @@ class StateManager:
             True if already alerted, False otherwise
         """
         key = self._create_departure_key(route_id, trip_id, stop_id)
+        dep = self.state["tracked_departures"].get(key)
 
-        for dep in self.state["tracked_departures"]:
-            if dep.get("key") == key and dep.get("initial_alert_sent"):
-                return True
-
-        return False
+        return bool(dep and dep.get("initial_alert_sent"))
 
     def has_sent_delay_update(self, route_id: str, trip_id: str, stop_id: str) -> bool:
         """
@@ -114,12 +330,11 @@ class StateManager:
             True if delay update already sent, False otherwise
         """
         key = self._create_departure_key(route_id, trip_id, stop_id)
+        dep = self.state["tracked_departures"].get(key)
 
-        for dep in self.state["tracked_departures"]:
-            if dep.get("key") == key:
-                return dep.get("delay_update_sent", False)
-
-        return False
+        if dep is None:
+            return False
+        return dep.get("delay_update_sent", False)
 
     def record_alert(
         self,
@@ -127,7 +342,8 @@ class StateManager:
         trip_id: str,
         stop_id: str,
         departure_time: datetime,
-        alert_time: Optional[datetime] = None
+        alert_time: Optional[datetime] = None,
+        force: bool = False
     ):
         """
         Record that an initial alert has been sent for a departure.
@@ -138,6 +354,7 @@ class StateManager:
             stop_id: Stop ID
             departure_time: Departure time (UTC)
             alert_time: When alert was sent (UTC). If None, uses current time.
+            force: Rewrite the state file immediately instead of waiting for the next snapshot
         """
         if alert_time is None:
             alert_time = datetime.now(timezone.utc)
@@ -145,29 +362,59 @@ class StateManager:
         key = self._create_departure_key(route_id, trip_id, stop_id)
 
         # Check if already exists
-        for dep in self.state["tracked_departures"]:
-            if dep.get("key") == key:
-                dep["initial_alert_sent"] = True
-                dep["initial_alert_time"] = alert_time.isoformat()
-                dep["original_departure_time"] = departure_time.isoformat()
-                dep["current_departure_time"] = departure_time.isoformat()
-                self._save_state()
-                return
-
-        # Add new tracking entry
-        self.state["tracked_departures"].append({
-            "key": key,
-            "route_id": str(route_id),
-            "trip_id": str(trip_id),
-            "stop_id": str(stop_id),
-            "original_departure_time": departure_time.isoformat(),
-            "current_departure_time": departure_time.isoformat(),
-            "initial_alert_sent": True,
-            "initial_alert_time": alert_time.isoformat(),
-            "delay_update_sent": False
-        })
-
-        self._save_state()
+        dep = self.state["tracked_departures"].get(key)
+        if dep is not None:
+            dep["initial_alert_sent"] = True
+            dep["initial_alert_time"] = alert_time.isoformat()
+            dep["original_departure_time"] = departure_time.isoformat()
+            dep["original_departure_ts"] = departure_time.timestamp()
+            dep["current_departure_time"] = departure_time.isoformat()
+        else:
+            # Add new tracking entry
+            self.state["tracked_departures"][key] = {
+                "key": "_".join(key),
+                "route_id": key[0],
+                "trip_id": key[1],
+                "stop_id": key[2],
+                "original_departure_time": departure_time.isoformat(),
+                "original_departure_ts": departure_time.timestamp(),
+                "current_departure_time": departure_time.isoformat(),
+                "initial_alert_sent": True,
+                "initial_alert_time": alert_time.isoformat(),
+                "delay_update_sent": False
+            }
+            dep = self.state["tracked_departures"][key]
+
+        bisect.insort(self._by_time, (dep["original_departure_ts"], key))
+
+        self._dirty = True
+        self._append_journal({"op": "put", "entry": dep})
+
+        # The journal only records puts, so write a snapshot to drop evicted entries
+        if len(self.state["tracked_departures"]) > self.max_entries:
+            self._evict_oldest()
+            force = True
+
+        if force:
+            self._snapshot()
+
+    def _evict_oldest(self):
+        """Drop the departures with the oldest times until the state is back under max_entries."""
+        tracked = self.state["tracked_departures"]
+        excess = len(tracked) - self.max_entries
+
+        index = 0
+        evicted = 0
+        while evicted < excess and index < len(self._by_time):
+            ts, key = self._by_time[index]
+            index += 1
+            dep = tracked.get(key)
+            if dep is not None and dep["original_departure_ts"] == ts:
+                del tracked[key]
+                evicted += 1
+        del self._by_time[:index]
+
+        print(f"Warning: Tracking more than {self.max_entries} departures, evicted the {evicted} oldest")
 
     def record_delay_update(self, route_id: str, trip_id: str, stop_id: str, new_departure_time: datetime):
         """
@@ -180,14 +427,14 @@ class StateManager:
             new_departure_time: New departure time (UTC)
         """
         key = self._create_departure_key(route_id, trip_id, stop_id)
+        dep = self.state["tracked_departures"].get(key)
 
-        for dep in self.state["tracked_departures"]:
-            if dep.get("key") == key:
-                dep["delay_update_sent"] = True
-                dep["current_departure_time"] = new_departure_time.isoformat()
-                dep["delay_update_time"] = datetime.now(timezone.utc).isoformat()
-                self._save_state()
-                return
+        if dep is not None:
+            dep["delay_update_sent"] = True
+            dep["current_departure_time"] = new_departure_time.isoformat()
+            dep["delay_update_time"] = datetime.now(timezone.utc).isoformat()
+            self._dirty = True
+            self._append_journal({"op": "put", "entry": dep})
 
     def get_tracked_departure(self, route_id: str, trip_id: str, stop_id: str) -> Optional[Dict]:
         """
@@ -203,11 +450,7 @@ class StateManager:
         """
         key = self._create_departure_key(route_id, trip_id, stop_id)
 
-        for dep in self.state["tracked_departures"]:
-            if dep.get("key") == key:
-                return dep
-
-        return None
+        return self.state["tracked_departures"].get(key)
 
     def cleanup_old_entries(self, max_age_hours: int = 2):
         """
@@ -216,11 +459,282 @@ class StateManager:
         Args:
             max_age_hours: Maximum age of entries to keep (default 2 hours)
         """
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+        cutoff_ts = (datetime.now(timezone.utc) - timedelta(hours=max_age_hours)).timestamp()
+
+        # Only the entries at or before the cutoff are visited
+        index = bisect.bisect_right(self._by_time, cutoff_ts, key=lambda item: item[0])
+        if not index:
+            return
+
+        tracked = self.state["tracked_departures"]
+        removed = 0
+        for _, key in self._by_time[:index]:
+            dep = tracked.get(key)
+            if dep is not None and dep["original_departure_ts"] <= cutoff_ts:
+                del tracked[key]
+                removed += 1
+        del self._by_time[:index]
+
+        if removed:
+            # The journal only records puts, so write a snapshot to drop removed entries
+            self._dirty = True
+            self._snapshot()
+
+
+class SQLiteStateManager:
+    """
+    Manages alert tracking state in a SQLite database.
+
+    Drop-in alternative to StateManager: lookups use the primary-key index and
+    each mutation touches a single row instead of rewriting the whole file.
+    Mutations are committed together by flush(). WAL mode lets overlapping
+    runs read while another run writes; write transactions are kept short
+    and never held across network I/O, so an overlapping run doesn't time
+    out waiting for the lock.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS alerts (
+            route_id TEXT NOT NULL,
+            trip_id TEXT NOT NULL,
+            stop_id TEXT NOT NULL,
+            original_departure_time TEXT NOT NULL,
+            original_departure_ts REAL NOT NULL,
+            current_departure_time TEXT NOT NULL,
+            alerted_at TEXT NOT NULL,
+            delay_sent INTEGER NOT NULL DEFAULT 0,
+            delay_update_time TEXT,
+            PRIMARY KEY (route_id, trip_id, stop_id)
+        );
+        CREATE INDEX IF NOT EXISTS alerts_original_departure_ts
+            ON alerts (original_departure_ts);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_file: str = "alert_state.db"):
+        """
+        Initialize the state manager.
 
-        self.state["tracked_departures"] = [
-            dep for dep in self.state["tracked_departures"]
-            if datetime.fromisoformat(dep.get("original_departure_time", "1970-01-01T00:00:00+00:00")) > cutoff_time
-        ]
+        Args:
+            db_file: Path to the SQLite database file
+        """
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self._SCHEMA)
+
+        # Held in memory until flush(), so a check doesn't open a write
+        # transaction before fetching departures
+        self._last_run: Optional[str] = None
+
+    def flush(self):
+        """Write the last run time and commit any pending changes."""
+        try:
+            if self._last_run is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_run', ?)",
+                    (self._last_run,)
+                )
+            self.conn.commit()
+            self._last_run = None
+        except sqlite3.OperationalError as e:
+            self.conn.rollback()
+            print(f"Warning: Could not save state to {self.db_file}: {e}")
+
+    def close(self):
+        """Commit any pending changes and close the database."""
+        self.flush()
+        self.conn.close()
+
+    def update_last_run(self, run_time: Optional[datetime] = None, persist: bool = False):
+        """
+        Update the last run timestamp.
+
+        The change is written by the next flush() unless persist is set.
+
+        Args:
+            run_time: Time of the run (UTC). If None, uses current time.
+            persist: Write the state immediately as a checkpoint
+        """
+        if run_time is None:
+            run_time = datetime.now(timezone.utc)
+
+        self._last_run = run_time.isoformat()
 
-        self._save_state()
+        if persist:
+            self.flush()
+
+    def has_alerted(self, route_id: str, trip_id: str, stop_id: str) -> bool:
+        """
+        Check if we've already sent an initial alert for this departure.
+
+        Args:
+            route_id: Route ID
+            trip_id: Trip ID
+            stop_id: Stop ID
+
+        Returns:
+            True if already alerted, False otherwise
+        """
+        row = self.conn.execute(
+            "SELECT 1 FROM alerts WHERE route_id = ? AND trip_id = ? AND stop_id = ? LIMIT 1",
+            (str(route_id), str(trip_id), str(stop_id))
+        ).fetchone()
+
+        return row is not None
+
+    def has_sent_delay_update(self, route_id: str, trip_id: str, stop_id: str) -> bool:
+        """
+        Check if we've already sent a delay update for this departure.
+
+        Args:
+            route_id: Route ID
+            trip_id: Trip ID
+            stop_id: Stop ID
+
+        Returns:
+            True if delay update already sent, False otherwise
+        """
+        row = self.conn.execute(
+            "SELECT delay_sent FROM alerts WHERE route_id = ? AND trip_id = ? AND stop_id = ?",
+            (str(route_id), str(trip_id), str(stop_id))
+        ).fetchone()
+
+        return bool(row and row["delay_sent"])
+
+    def record_alert(
+        self,
+        route_id: str,
+        trip_id: str,
+        stop_id: str,
+        departure_time: datetime,
+        alert_time: Optional[datetime] = None,
+        force: bool = False
+    ):
+        """
+        Record that an initial alert has been sent for a departure.
+
+        Args:
+            route_id: Route ID
+            trip_id: Trip ID
+            stop_id: Stop ID
+            departure_time: Departure time (UTC)
+            alert_time: When alert was sent (UTC). If None, uses current time.
+            force: Commit immediately instead of on the next flush()
+        """
+        if alert_time is None:
+            alert_time = datetime.now(timezone.utc)
+
+        self.conn.execute(
+            """
+            INSERT INTO alerts (
+                route_id, trip_id, stop_id, original_departure_time,
+                original_departure_ts, current_departure_time, alerted_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (route_id, trip_id, stop_id) DO UPDATE SET
+                original_departure_time = excluded.original_departure_time,
+                original_departure_ts = excluded.original_departure_ts,
+                current_departure_time = excluded.current_departure_time,
+                alerted_at = excluded.alerted_at
+            """,
+            (
+                str(route_id),
+                str(trip_id),
+                str(stop_id),
+                departure_time.isoformat(),
+                departure_time.timestamp(),
+                departure_time.isoformat(),
+                alert_time.isoformat()
+            )
+        )
+
+        if force:
+            self.flush()
+
+    def record_delay_update(self, route_id: str, trip_id: str, stop_id: str, new_departure_time: datetime):
+        """
+        Record that a delay update has been sent for a departure.
+
+        Args:
+            route_id: Route ID
+            trip_id: Trip ID
+            stop_id: Stop ID
+            new_departure_time: New departure time (UTC)
+        """
+        self.conn.execute(
+            """
+            UPDATE alerts
+            SET delay_sent = 1, current_departure_time = ?, delay_update_time = ?
+            WHERE route_id = ? AND trip_id = ? AND stop_id = ?
+            """,
+            (
+                new_departure_time.isoformat(),
+                datetime.now(timezone.utc).isoformat(),
+                str(route_id),
+                str(trip_id),
+                str(stop_id)
+            )
+        )
+
+    def get_tracked_departure(self, route_id: str, trip_id: str, stop_id: str) -> Optional[Dict]:
+        """
+        Get the tracked state for a departure.
+
+        Args:
+            route_id: Route ID
+            trip_id: Trip ID
+            stop_id: Stop ID
+
+        Returns:
+            Tracked departure dict (same shape as StateManager's) or None if not found
+        """
+        row = self.conn.execute(
+            "SELECT * FROM alerts WHERE route_id = ? AND trip_id = ? AND stop_id = ?",
+            (str(route_id), str(trip_id), str(stop_id))
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        tracked = {
+            "key": "_".join((row["route_id"], row["trip_id"], row["stop_id"])),
+            "route_id": row["route_id"],
+            "trip_id": row["trip_id"],
+            "stop_id": row["stop_id"],
+            "original_departure_time": row["original_departure_time"],
+            "original_departure_ts": row["original_departure_ts"],
+            "current_departure_time": row["current_departure_time"],
+            "initial_alert_sent": True,
+            "initial_alert_time": row["alerted_at"],
+            "delay_update_sent": bool(row["delay_sent"])
+        }
+        if row["delay_update_time"]:
+            tracked["delay_update_time"] = row["delay_update_time"]
+
+        return tracked
+
+    def cleanup_old_entries(self, max_age_hours: int = 2):
+        """
+        Remove old tracking entries to keep the database small.
+
+        Runs in its own transaction, committed immediately, because it is
+        called before departures are fetched.
+
+        Args:
+            max_age_hours: Maximum age of entries to keep (default 2 hours)
+        """
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
+
+        try:
+            self.conn.execute(
+                "DELETE FROM alerts WHERE original_departure_ts <= ?",
+                (cutoff_time.timestamp(),)
+            )
+            self.conn.commit()
+        except sqlite3.OperationalError as e:
+            self.conn.rollback()
+            print(f"Warning: Could not clean up {self.db_file}: {e}")
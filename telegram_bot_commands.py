@@ -7,10 +7,13 @@ Run this on a server or use a webhook service.
 """
 
 import os
-import requests
-from telegram import Update
+import re
+import httpx
+from telegram import MessageEntity, Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
+from src import json_utils
+
 # Configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 GITHUB_TOKEN = os.getenv('GITHUB_PAT')  # Your Personal Access Token
@@ -19,29 +22,82 @@ GITHUB_REPO = os.getenv('GITHUB_REPO')  # Format: "username/repo-name"
 # GitHub API endpoint for repository dispatch
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/dispatches"
 
+HEADERS = {
+    "Accept": "application/vnd.github+json",
+    "Authorization": f"Bearer {GITHUB_TOKEN}",
+    "Content-Type": "application/json",
+    "X-GitHub-Api-Version": "2022-11-28"
+}
+
+# Only two dispatch events are ever sent, so encode their bodies once
+_PAYLOADS = {
+    action_type: json_utils.dumps({"event_type": action_type})
+    for action_type in ("pause-alerts", "resume-alerts")
+}
+
+# Shared async client so dispatches don't block the bot's event loop and
+# reuse one HTTP/2 connection to api.github.com (retries connection failures)
+_http = httpx.AsyncClient(
+    timeout=10.0,
+    transport=httpx.AsyncHTTPTransport(http2=True, retries=3)
+)
+
+
+# Help message, formatted once with explicit entities instead of having
+# Telegram parse Markdown on every /help
+_HELP_TITLE = "Bus Alert Bot Commands"
+HELP_TEXT = (
+    f"🚌 {_HELP_TITLE}\n"
+    "\n"
+    "/stop - Pause all bus alerts\n"
+    "/boarded - Same as /stop (use when you've boarded)\n"
+    "/start - Resume bus alerts\n"
+    "/help - Show this help message\n"
+    "\n"
+    "Once you send /stop or /boarded, you won't receive any more alerts until you send /start again."
+)
+
+
+def _utf16_len(text: str) -> int:
+    """Length of text in UTF-16 code units, which Telegram uses for entity offsets."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _build_help_entities(text: str) -> list:
+    """Bold the help title and mark every /command in the help text."""
+    entities = [
+        MessageEntity(
+            type=MessageEntity.BOLD,
+            offset=_utf16_len(text[:text.index(_HELP_TITLE)]),
+            length=_utf16_len(_HELP_TITLE)
+        )
+    ]
+
+    for match in re.finditer(r"/\w+", text):
+        entities.append(MessageEntity(
+            type=MessageEntity.BOT_COMMAND,
+            offset=_utf16_len(text[:match.start()]),
+            length=_utf16_len(match.group())
+        ))
+
+    return entities
+
+
+HELP_ENTITIES = _build_help_entities(HELP_TEXT)
 
-def trigger_github_action(action_type: str):
+
+async def trigger_github_action(action_type: str):
     """
     Trigger a GitHub Actions workflow via repository dispatch.
 
     Args:
         action_type: Either 'pause-alerts' or 'resume-alerts'
     """
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "X-GitHub-Api-Version": "2022-11-28"
-    }
-
-    payload = {
-        "event_type": action_type
-    }
-
     try:
-        response = requests.post(GITHUB_API_URL, json=payload, headers=headers)
+        response = await _http.post(GITHUB_API_URL, content=_PAYLOADS[action_type], headers=HEADERS)
         response.raise_for_status()
         return True
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error triggering GitHub Action: {e}")
         return False
 
@@ -50,7 +106,7 @@ async def stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /stop or /boarded command."""
     await update.message.reply_text("⏸️ Pausing bus alerts...")
 
-    if trigger_github_action('pause-alerts'):
+    if await trigger_github_action('pause-alerts'):
         await update.message.reply_text(
             "✅ Bus alerts paused!\n\n"
             "You won't receive any more alerts until you send /start"
@@ -68,7 +124,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command to resume alerts."""
     await update.message.reply_text("▶️ Resuming bus alerts...")
 
-    if trigger_github_action('resume-alerts'):
+    if await trigger_github_action('resume-alerts'):
         await update.message.reply_text(
             "✅ Bus alerts resumed!\n\n"
             "You'll receive alerts again during your scheduled window."
@@ -79,21 +135,24 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /help command."""
-    help_text = """
-🚌 *Bus Alert Bot Commands*
+    await update.message.reply_text(HELP_TEXT, entities=HELP_ENTITIES)
 
-/stop - Pause all bus alerts
-/boarded - Same as /stop (use when you've boarded)
-/start - Resume bus alerts
-/help - Show this help message
 
-Once you send /stop or /boarded, you won't receive any more alerts until you send /start again.
-    """
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+async def close_http_client(application: Application):
+    """Close the shared HTTP client when the bot shuts down."""
+    await _http.aclose()
 
 
 def main():
     """Start the bot."""
+    # Run the bot on uvloop when it's installed; it must be installed before
+    # the Application creates its event loop
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     if not TELEGRAM_BOT_TOKEN:
         raise ValueError("TELEGRAM_BOT_TOKEN environment variable not set")
     if not GITHUB_TOKEN:
@@ -102,7 +161,12 @@ def main():
         raise ValueError("GITHUB_REPO environment variable not set (format: username/repo-name)")
 
     # Create the Application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_shutdown(close_http_client)
+        .build()
+    )
 
     # Register command handlers
     application.add_handler(CommandHandler("stop", stop_command))
@@ -5,9 +5,11 @@ Run this first to make sure we can fetch bus data!
 """
 
 import requests
-import json
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 
+from src import json_utils
+
 # Your configuration
 STOP_ID = "50195"
 ROUTES = [
@@ -17,6 +19,14 @@ ROUTES = [
 
 BASE_URL = "https://svc.metrotransit.org/nextrip"
 
+# Keep-alive connection pool for svc.metrotransit.org
+SESSION = requests.Session()
+SESSION.mount(BASE_URL, HTTPAdapter(pool_connections=1, pool_maxsize=4))
+SESSION.headers.update({
+    "Accept": "application/json",
+    "User-Agent": "metro-transit-pings/1.0"
+})
+
 
 def test_api():
     """Test the Metro Transit API with your routes."""
@@ -32,10 +42,10 @@ def test_api():
 
     try:
         print(f"Fetching: {url}")
-        response = requests.get(url, timeout=10)
+        response = SESSION.get(url, timeout=10)
         response.raise_for_status()
 
-        data = response.json()
+        data = json_utils.loads(response.content)
 
         # Extract the departures list from the response
         all_departures = data.get('departures', [])
@@ -45,6 +55,14 @@ def test_api():
         else:
             print(f"  ✓ Found {len(all_departures)} total upcoming departure(s)\n")
 
+            # Group departures by configured route in a single pass. The API
+            # returns departures as JSON objects, so no per-element type check
+            grouped = {route_info["route"]: [] for route_info in ROUTES}
+            for d in all_departures:
+                bucket = grouped.get(str(d.get('route_id', '')))
+                if bucket is not None:
+                    bucket.append(d)
+
             # Filter and display for each configured route
             for route_info in ROUTES:
                 route_id = route_info["route"]
@@ -52,11 +70,7 @@ def test_api():
 
                 print(f"\n--- {name} ---")
 
-                # Filter departures for this route
-                route_departures = [
-                    d for d in all_departures
-                    if isinstance(d, dict) and str(d.get('route_id', '')) == route_id
-                ]
+                route_departures = grouped[route_id]
 
                 if not route_departures:
                     print("  ⚠️  No departures found for this route")
@@ -84,7 +98,7 @@ def test_api():
         if hasattr(e, 'response') and e.response is not None:
             print(f"  Status: {e.response.status_code}")
             print(f"  Body: {e.response.text[:500]}")
-    except json.JSONDecodeError as e:
+    except json_utils.JSONDecodeError as e:
         print(f"  ✗ JSON Error: {e}")
 
     print("\n" + "=" * 60)